@@ -18,90 +18,103 @@ Optional .env overrides (sensible defaults are provided):
     VECTOR_STORE_PATH          (default: ./data/vector_store)
     TOP_K_RESULTS              (default: 3)
     SIMILARITY_THRESHOLD       (default: 0.6)
+    CORS_ORIGINS               (default: empty → CORS middleware disabled)
 """
 
-import os
-from typing import Optional
+from typing import ClassVar, Optional, Union
 
 from dotenv import load_dotenv
+from pydantic import Field, PrivateAttr, field_validator, model_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 # Load .env from project root (or any parent directory)
 load_dotenv()
 
 
-class AWSConfig:
+class AWSConfig(BaseSettings):
     """
     Singleton configuration class for Mistri.AI's AWS / Bedrock integration.
 
     Design notes
     ────────────
-    • Singleton pattern: guarantees a single source-of-truth for credentials.
-    • Validation on startup: fails fast if mandatory env vars are absent so
-      the error surfaces at import time, not mid-request.
+    • Singleton: the module-level ``config`` instance is the single
+      source-of-truth for credentials; downstream code never constructs one.
+    • Typed validation on startup: pydantic-settings parses and range-checks
+      every setting once, at import, and fails fast if mandatory env vars are
+      absent — the error surfaces at import time, not mid-request.
+    • Frozen: settings are read-only after load.
     • Category constants live here so every module uses the same strings
       (prevents category typos across the codebase).
     """
 
-    _instance: Optional["AWSConfig"] = None
-
-    def __new__(cls) -> "AWSConfig":
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            cls._instance._initialized = False
-        return cls._instance
-
-    def __init__(self) -> None:
-        if self._initialized:
-            return
-
-        # ── AWS Credentials ──────────────────────────────────────────────────
-        self.aws_access_key_id: Optional[str] = os.getenv("AWS_ACCESS_KEY_ID")
-        self.aws_secret_access_key: Optional[str] = os.getenv("AWS_SECRET_ACCESS_KEY")
-        self.aws_region: str = os.getenv("AWS_REGION", "us-east-1")
-
-        # ── Bedrock Model IDs ────────────────────────────────────────────────
-        # Titan Embed Text v2 – produces 1 024-dim text embeddings.
-        # NFR-001: keeps latency low by operating purely on text at retrieval time.
-        self.bedrock_embed_model: str = os.getenv(
-            "BEDROCK_EMBED_MODEL",
-            "amazon.titan-embed-text-v2:0",
-        )
-
-        # Claude 3.5 Sonnet – reasoning / answer synthesis at the inference step.
-        self.bedrock_llm_model: str = os.getenv(
-            "BEDROCK_LLM_MODEL",
-            "anthropic.claude-3-5-sonnet-20240620-v1:0",
-        )
-
-        # ── Local Vector Store (FAISS – Aurora mock) ─────────────────────────
-        self.vector_store_path: str = os.getenv(
-            "VECTOR_STORE_PATH",
-            "./data/vector_store",
-        )
-
-        # ── Retrieval Parameters ─────────────────────────────────────────────
-        self.top_k_results: int = int(os.getenv("TOP_K_RESULTS", "3"))
-        self.similarity_threshold: float = float(
-            os.getenv("SIMILARITY_THRESHOLD", "0.6")
-        )
-
-        # ── Semantic Router: Category Constants ──────────────────────────────
-        # These are the metadata tags attached to every vector in the FAISS index.
-        # The Tree Searcher (rag_retrieve.py) uses them to pre-filter results,
-        # satisfying NFR-001 (low-latency category-scoped retrieval).
-        self.CATEGORY_ERROR_CODES: str = "ERROR_CODES"
-        self.CATEGORY_SCHEMATICS: str = "SCHEMATICS"
-        self.CATEGORY_GENERAL: str = "GENERAL"
-
-        # ── Validate ─────────────────────────────────────────────────────────
-        self._validate()
-        self._initialized = True
+    # Field names map case-insensitively to env vars (aws_region ← AWS_REGION).
+    # hide_input_in_errors keeps the secret key out of validation messages.
+    model_config = SettingsConfigDict(
+        extra="ignore",
+        frozen=True,
+        hide_input_in_errors=True,
+    )
+
+    # ── AWS Credentials ──────────────────────────────────────────────────────
+    aws_access_key_id: Optional[str] = None
+    aws_secret_access_key: Optional[str] = None
+    aws_region: str = "us-east-1"
+
+    # ── Bedrock Model IDs ────────────────────────────────────────────────────
+    # Titan Embed Text v2 – produces 1 024-dim text embeddings.
+    # NFR-001: keeps latency low by operating purely on text at retrieval time.
+    bedrock_embed_model: str = "amazon.titan-embed-text-v2:0"
+
+    # Claude 3.5 Sonnet – reasoning / answer synthesis at the inference step.
+    bedrock_llm_model: str = "anthropic.claude-3-5-sonnet-20240620-v1:0"
+
+    # ── Local Vector Store (FAISS – Aurora mock) ─────────────────────────────
+    vector_store_path: str = "./data/vector_store"
+
+    # ── Retrieval Parameters ─────────────────────────────────────────────────
+    # similarity_threshold is a cosine similarity in [0, 1]: the index stores
+    # L2-normalized vectors and scores by inner product, so higher = closer.
+    top_k_results: int = Field(3, ge=1, le=50)
+    similarity_threshold: float = Field(0.6, ge=0.0, le=1.0)
+
+    # ── API ──────────────────────────────────────────────────────────────────
+    # Comma-separated browser origins allowed to call the API. Empty means
+    # same-origin only, and the CORS middleware is not installed at all.
+    # (Typed as a Union so pydantic-settings passes the raw string through
+    # instead of trying to JSON-decode it; _split_cors_origins makes it a list.)
+    cors_origins: Union[list[str], str] = []
+
+    # ── Semantic Router: Category Constants ──────────────────────────────────
+    # These are the metadata tags attached to every vector in the FAISS index.
+    # The Tree Searcher (rag_retrieve.py) uses them to pre-filter results,
+    # satisfying NFR-001 (low-latency category-scoped retrieval).
+    CATEGORY_ERROR_CODES: ClassVar[str] = "ERROR_CODES"
+    CATEGORY_SCHEMATICS: ClassVar[str] = "SCHEMATICS"
+    CATEGORY_GENERAL: ClassVar[str] = "GENERAL"
+
+    # ── Shared clients (built lazily by get_bedrock_client) ──────────────────
+    _bedrock_client = PrivateAttr(default=None)
 
     # ─────────────────────────────────────────────────────────────────────────
-    # Private helpers
+    # Validators
     # ─────────────────────────────────────────────────────────────────────────
 
-    def _validate(self) -> None:
+    @field_validator("cors_origins", mode="before")
+    @classmethod
+    def _split_cors_origins(cls, value):
+        if isinstance(value, str):
+            value = [origin.strip() for origin in value.split(",") if origin.strip()]
+        # CORS middleware is installed with allow_credentials=True, under which
+        # Starlette reflects any Origin for "*": origins must be listed explicitly.
+        if "*" in value:
+            raise ValueError(
+                "[Mistri.AI] CORS_ORIGINS must list explicit origins; "
+                "'*' is not allowed with credentials."
+            )
+        return value
+
+    @model_validator(mode="after")
+    def _validate(self) -> "AWSConfig":
         """Raise ValueError at startup if mandatory credentials are missing."""
         missing: list[str] = []
         if not self.aws_access_key_id:
@@ -115,6 +128,7 @@ class AWSConfig:
                 f"{', '.join(missing)}. "
                 f"Add them to your .env file and restart."
             )
+        return self
 
     # ─────────────────────────────────────────────────────────────────────────
     # Public helpers
@@ -135,18 +149,42 @@ class AWSConfig:
             "region_name": self.aws_region,
         }
 
+    def embed_model_accepts_batches(self) -> bool:
+        """
+        True if the embed model takes many texts per ``invoke_model`` call.
+
+        Cohere embed models accept ``{"texts": [...]}``; Titan embeds one
+        ``inputText`` per request.
+        """
+        return self.bedrock_embed_model.startswith("cohere.embed")
+
     def get_bedrock_client(self):
         """
-        Convenience factory: returns a ready-to-use ``bedrock-runtime`` client.
+        Return the shared ``bedrock-runtime`` client, creating it on first use.
+
+        Session/client construction parses ~/.aws config and loads service
+        models, so it is done once per process. boto3 clients are thread-safe;
+        the connection pool is sized for concurrent embedding calls.
 
         Returns
         -------
         botocore.client.BedrockRuntime
         """
-        import boto3  # local import so the module is importable without boto3
-
-        session = boto3.Session(**self.get_boto3_session_kwargs())
-        return session.client(service_name="bedrock-runtime")
+        if self._bedrock_client is None:
+            # local imports so the module is importable without boto3
+            import boto3
+            from botocore.config import Config
+
+            session = boto3.Session(**self.get_boto3_session_kwargs())
+            self._bedrock_client = session.client(
+                service_name="bedrock-runtime",
+                config=Config(
+                    max_pool_connections=32,
+                    tcp_keepalive=True,  # reuse sockets, skip per-call TLS handshakes
+                    retries={"max_attempts": 5, "mode": "adaptive"},
+                ),
+            )
+        return self._bedrock_client
 
     def __repr__(self) -> str:
         return (
@@ -2,6 +2,8 @@
 FastAPI Main Application for Mistri.AI
 Provides REST API endpoints for hardware repair diagnosis using RAG.
 """
+import asyncio
+import functools
 import logging
 from typing import Optional
 from io import BytesIO
@@ -30,14 +32,18 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# Configure CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # TODO: Restrict in production
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Configure CORS only when cross-origin callers are configured; otherwise skip
+# the middleware entirely so same-origin requests don't pay for it.
+# Origins are explicit: AWSConfig rejects a "*" wildcard, which is not valid
+# together with credentials.
+if config.cors_origins:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=config.cors_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
 
 # Response Models
@@ -65,6 +71,51 @@ async def root():
     )
 
 
+# Intent-detection patterns, compiled once at import.
+# Error code: 1-3 letters, optional digit (e.g. IE, DE, UE, dE, dE1, dE2, PE)
+# Kept as a regex: a hand-rolled str.split() token scan is no faster on typical
+# 20-60 char queries (slower on early hits) and loses \b handling of punctuation.
+_ERROR_CODE_RE = re.compile(r'\b[A-Za-z]{1,3}\d?\b')
+# Error keywords, matched as substrings of the lower-cased text. Plain `in`
+# checks in a loop beat a case-insensitive alternation regex on short queries.
+_ERROR_KEYWORDS = frozenset({'error', 'code', 'display', 'showing', 'flashing'})
+
+
+# Only queries up to this length are memoized, so the cache holds at most
+# 1024 short keys rather than pinning arbitrarily large request bodies.
+_INTENT_CACHE_MAX_TEXT_LEN = 256
+
+
+def _detect_intent_core(text: str, has_image: bool) -> tuple[Optional[str], str]:
+    """
+    Pure routing core of ``detect_intent``.
+    
+    Returns:
+        (category or None, human-readable reason for the log line)
+    """
+    # If image is uploaded, assume schematic/board repair intent
+    if has_image:
+        return config.CATEGORY_SCHEMATICS, "image uploaded"
+    
+    # Check for error code pattern in text (1-3 letters, optional digit)
+    # Examples: IE, DE, UE, dE, dE1, dE2, PE, LE, EE, PF
+    if _ERROR_CODE_RE.search(text):
+        return config.CATEGORY_ERROR_CODES, "error code pattern found"
+    
+    # Check for error-related keywords
+    text_lower = text.lower()
+    for keyword in _ERROR_KEYWORDS:
+        if keyword in text_lower:
+            return config.CATEGORY_ERROR_CODES, "error keywords found"
+    
+    # Default: search all categories
+    return None, "searching all categories"
+
+
+# Memoized so repeated short queries (retries, demos, test harnesses) skip the
+# regex/keyword scan.
+_detect_intent_cached = functools.lru_cache(maxsize=1024)(_detect_intent_core)
+
 
 def detect_intent(text: str, has_image: bool) -> Optional[str]:
     """
@@ -82,27 +133,12 @@ def detect_intent(text: str, has_image: bool) -> Optional[str]:
     Returns:
         Category string or None
     """
-    # If image is uploaded, assume schematic/board repair intent
-    if has_image:
-        logger.info("Intent detected: SCHEMATICS (image uploaded)")
-        return config.CATEGORY_SCHEMATICS
-    
-    # Check for error code pattern in text (1-3 uppercase letters, optional digit)
-    # Examples: IE, DE, UE, dE, dE1, dE2, PE, LE, EE, PF
-    error_code_pattern = r'\b[A-Z]{1,3}\d?\b'
-    if re.search(error_code_pattern, text.upper()):
-        logger.info("Intent detected: ERROR_CODES (error code pattern found)")
-        return config.CATEGORY_ERROR_CODES
-    
-    # Check for error-related keywords
-    error_keywords = ['error', 'code', 'display', 'showing', 'flashing']
-    if any(keyword in text.lower() for keyword in error_keywords):
-        logger.info("Intent detected: ERROR_CODES (error keywords found)")
-        return config.CATEGORY_ERROR_CODES
-    
-    # Default: search all categories
-    logger.info("Intent detected: None (searching all categories)")
-    return None
+    if len(text) <= _INTENT_CACHE_MAX_TEXT_LEN:
+        category, reason = _detect_intent_cached(text, has_image)
+    else:
+        category, reason = _detect_intent_core(text, has_image)
+    logger.info(f"Intent detected: {category} ({reason})")
+    return category
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -160,10 +196,13 @@ async def diagnose(
         image_bytes = None
         if image:
             try:
-                # Read and validate image
+                # Read and validate image. Image.open is lazy: it parses only
+                # the header (format/size) and never decodes pixel data, since
+                # the raw bytes are forwarded unchanged. Cheap enough to stay
+                # on the event loop; don't call .load() here.
                 contents = await image.read()
-                img = Image.open(BytesIO(contents))
-                logger.info(f"Received image: {img.format} {img.size}")
+                header = Image.open(BytesIO(contents))
+                logger.info(f"Received image: {header.format} {header.size}")
                 image_bytes = contents
             except Exception as e:
                 logger.warning(f"Failed to process image: {e}")
@@ -172,9 +211,11 @@ async def diagnose(
         # Detect user intent for category-based filtering
         intent_category = detect_intent(text, has_image=image is not None)
         
-        # Perform RAG search with category filtering
+        # Perform RAG search with category filtering. search_manual blocks on
+        # Bedrock + FAISS, so run it in a worker thread to keep the event loop free.
         try:
-            matches = search_manual(
+            matches = await asyncio.to_thread(
+                search_manual,
                 query_text=text,
                 query_image_bytes=image_bytes,
                 intent_category=intent_category,  # THE TREE ROUTER
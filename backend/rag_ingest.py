@@ -3,15 +3,17 @@ RAG Ingestion Pipeline for Mistri.AI
 Reads error codes from CSV, generates embeddings using AWS Bedrock, and stores in FAISS.
 """
 import os
-import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 
-import boto3
 import pandas as pd
 import numpy as np
 import faiss
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
 
 from backend.config import config
 
@@ -22,6 +24,90 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Concurrent invoke_model calls issued during ingestion. Embedding is I/O-bound
+# (network round-trip dominates), so threads overlap the Bedrock latency.
+EMBED_MAX_WORKERS = 16
+
+# Texts packed into one invoke_model call for batch-capable embed models (Cohere)
+EMBED_BATCH_SIZE = 25
+
+# HNSW graph parameters: M neighbours per node, and the candidate list size
+# used while building the graph (higher = better recall, slower build).
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+
+# Stored vector precision. fp16 halves index memory and bytes read per query;
+# the ranking loss is negligible for unit-normalized 1024-dim vectors.
+VECTOR_QUANTIZER = faiss.ScalarQuantizer.QT_fp16
+
+
+def generate_embedding(client, text: str) -> np.ndarray:
+    """
+    Generate embedding for text using Amazon Bedrock Titan.
+    
+    Pure function of its inputs so it can be fanned out across threads
+    (boto3 clients are thread-safe).
+    
+    Args:
+        client: bedrock-runtime client
+        text: Input text to embed
+        
+    Returns:
+        numpy array of embedding vector (1024 dimensions for Titan v2)
+        
+    Raises:
+        Exception: If Bedrock API call fails
+    """
+    # Prepare request body for Titan embeddings
+    request_body = orjson.dumps({
+        "inputText": text
+    })
+    
+    # Invoke Bedrock model
+    response = client.invoke_model(
+        modelId=config.bedrock_embed_model,
+        contentType='application/json',
+        accept='application/json',
+        body=request_body
+    )
+    
+    # Parse response
+    response_body = orjson.loads(response['body'].read())
+    return np.array(response_body['embedding'], dtype=np.float32)
+
+
+def generate_embeddings(client, texts: List[str]) -> np.ndarray:
+    """
+    Generate embeddings for several texts in one Bedrock call.
+    
+    Only valid for batch-capable models (see
+    ``config.embed_model_accepts_batches``), e.g. Cohere embed.
+    
+    Args:
+        client: bedrock-runtime client
+        texts: Input texts to embed (at most EMBED_BATCH_SIZE)
+        
+    Returns:
+        numpy array of shape (len(texts), dimension)
+        
+    Raises:
+        Exception: If Bedrock API call fails
+    """
+    request_body = orjson.dumps({
+        "texts": texts,
+        "input_type": "search_document"
+    })
+    
+    response = client.invoke_model(
+        modelId=config.bedrock_embed_model,
+        contentType='application/json',
+        accept='application/json',
+        body=request_body
+    )
+    
+    response_body = orjson.loads(response['body'].read())
+    return np.array(response_body['embeddings'], dtype=np.float32)
+
 
 class RAGIngestor:
     """
@@ -36,11 +122,9 @@ class RAGIngestor:
     def __init__(self):
         """Initialize the RAG ingestor with Bedrock client."""
         try:
-            # Initialize Bedrock Runtime client
-            self.bedrock_runtime = boto3.client(
-                service_name='bedrock-runtime',
-                **config.get_boto3_session_kwargs()
-            )
+            # Shared Bedrock Runtime client. Its connection pool is larger
+            # than EMBED_MAX_WORKERS so urllib3 doesn't serialize the threads.
+            self.bedrock_runtime = config.get_bedrock_client()
             logger.info(f"Initialized Bedrock client in region: {config.aws_region}")
         except Exception as e:
             logger.error(f"Failed to initialize Bedrock client: {e}")
@@ -49,8 +133,23 @@ class RAGIngestor:
         # Vector store configuration
         self.vector_store_path = Path(config.vector_store_path)
         self.index_file = self.vector_store_path / "faiss_index.bin"
-        self.metadata_file = self.vector_store_path / "metadata.json"
-        self.category_index_file = self.vector_store_path / "category_index.json"
+        self.vectors_file = self.vector_store_path / "vectors.npy"
+        self.metadata_file = self.vector_store_path / "metadata.parquet"
+        
+        # Per-category sub-index (THE TREE BRANCHES) + its sub-row -> global id map
+        categories = (
+            config.CATEGORY_ERROR_CODES,
+            config.CATEGORY_SCHEMATICS,
+            config.CATEGORY_GENERAL
+        )
+        self.category_index_files = {
+            category: self.vector_store_path / f"category_{category.lower()}.npy"
+            for category in categories
+        }
+        self.category_faiss_files = {
+            category: self.vector_store_path / f"faiss_{category.lower()}.bin"
+            for category in categories
+        }
         
         # Ensure vector store directory exists
         self.vector_store_path.mkdir(parents=True, exist_ok=True)
@@ -63,35 +162,53 @@ class RAGIngestor:
             text: Input text to embed
             
         Returns:
-            numpy array of embedding vector (1536 dimensions for Titan)
+            numpy array of embedding vector (1024 dimensions for Titan v2)
             
         Raises:
             Exception: If Bedrock API call fails
         """
         try:
-            # Prepare request body for Titan embeddings
-            request_body = json.dumps({
-                "inputText": text
-            })
-            
-            # Invoke Bedrock model
-            response = self.bedrock_runtime.invoke_model(
-                modelId=config.bedrock_embed_model,
-                contentType='application/json',
-                accept='application/json',
-                body=request_body
-            )
-            
-            # Parse response
-            response_body = json.loads(response['body'].read())
-            embedding = np.array(response_body['embedding'], dtype=np.float32)
-            
-            return embedding
-            
+            return generate_embedding(self.bedrock_runtime, text)
         except Exception as e:
             logger.error(f"Failed to generate embedding for text: {text[:50]}... Error: {e}")
             raise
     
+    def _try_generate_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Worker wrapper: returns None instead of raising so one bad row doesn't abort the batch."""
+        try:
+            return self.generate_embedding(text)
+        except Exception:
+            return None
+    
+    def _try_generate_embeddings(self, texts: List[str]) -> Optional[np.ndarray]:
+        """Batch worker wrapper: returns None instead of raising so one bad batch doesn't abort the run."""
+        try:
+            return generate_embeddings(self.bedrock_runtime, texts)
+        except Exception as e:
+            logger.error(f"Failed to generate embeddings for batch of {len(texts)}: {e}")
+            return None
+    
+    def _embed_texts(
+        self, texts: List[str], executor: ThreadPoolExecutor
+    ) -> Iterator[Optional[np.ndarray]]:
+        """
+        Yield one embedding per text, in input order (None for failures).
+        
+        Batch-capable models get EMBED_BATCH_SIZE texts per request; Titan
+        takes one text per request. Either way requests run concurrently on
+        the executor over the shared, keep-alive connection pool.
+        """
+        if not config.embed_model_accepts_batches():
+            yield from executor.map(self._try_generate_embedding, texts)
+            return
+        
+        batches = [texts[i:i + EMBED_BATCH_SIZE] for i in range(0, len(texts), EMBED_BATCH_SIZE)]
+        for batch, result in zip(batches, executor.map(self._try_generate_embeddings, batches)):
+            if result is None:
+                yield from [None] * len(batch)
+            else:
+                yield from result
+    
     def load_error_codes(self, csv_path: str) -> List[Dict[str, str]]:
         """
         Load error codes from CSV file.
@@ -103,19 +220,18 @@ class RAGIngestor:
             List of dictionaries containing error code data
         """
         try:
-            df = pd.read_csv(csv_path)
+            columns = {
+                'Error_Code': 'code',
+                'Error_Name': 'name',
+                'Description_Cause': 'description'
+            }
+            # Parse only the columns we use, as strings (no per-row Series)
+            df = pd.read_csv(csv_path, usecols=list(columns), dtype=str)
             logger.info(f"Loaded {len(df)} error codes from {csv_path}")
             
-            # Convert to list of dicts
-            error_codes = []
-            for _, row in df.iterrows():
-                error_codes.append({
-                    'code': str(row['Error_Code']),
-                    'name': str(row['Error_Name']),
-                    'description': str(row['Description_Cause'])
-                })
-            
-            return error_codes
+            # Convert to list of dicts in one vectorized pass
+            df = df.rename(columns=columns)[list(columns.values())].astype(str)
+            return df.to_dict(orient='records')
             
         except Exception as e:
             logger.error(f"Failed to load error codes from {csv_path}: {e}")
@@ -133,6 +249,28 @@ class RAGIngestor:
         """
         return f"Error {error['code']}: {error['name']} - {error['description']}"
     
+    def _build_index(self, vectors: np.ndarray) -> faiss.Index:
+        """
+        Build a FAISS index over L2-normalized vectors.
+        
+        HNSW graph: sub-linear ANN search instead of a full O(N·d) scan per query.
+        Inner product on unit vectors ranks identically to L2 with less math.
+        Vectors are stored scalar-quantized (fp16) rather than as raw float32.
+        
+        Args:
+            vectors: float32 array of shape (n, dimension)
+            
+        Returns:
+            Trained and populated FAISS index
+        """
+        index = faiss.IndexHNSWSQ(
+            vectors.shape[1], VECTOR_QUANTIZER, HNSW_M, faiss.METRIC_INNER_PRODUCT
+        )
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.train(vectors)
+        index.add(vectors)
+        return index
+    
     def ingest_error_codes(self, csv_path: str, batch_size: int = 10):
         """
         Main ingestion pipeline: Load CSV, generate embeddings, store in FAISS.
@@ -149,50 +287,66 @@ class RAGIngestor:
         error_codes = self.load_error_codes(csv_path)
         
         # Generate embeddings
-        embeddings = []
-        metadata = []
+        embeddings_array = None  # allocated once the embedding dimension is known
+        n_embedded = 0
+        # Metadata is kept column-wise (one list per field); row i describes
+        # FAISS row i, so the row number doubles as the metadata id
+        metadata = {
+            'category': [],
+            'type': [],
+            'code': [],
+            'name': [],
+            'description': [],
+            'text': []
+        }
         category_index = {
             config.CATEGORY_ERROR_CODES: [],
             config.CATEGORY_SCHEMATICS: [],
             config.CATEGORY_GENERAL: []
         }
         
-        for i, error in enumerate(error_codes):
-            try:
-                # Format text
-                text = self.format_error_text(error)
+        # Format all texts up front, then fan the Bedrock calls out over a
+        # thread pool. Results come back in input order.
+        texts = [self.format_error_text(e) for e in error_codes]
+        logger.info(f"Generating {len(texts)} embeddings with {EMBED_MAX_WORKERS} workers...")
+        with ThreadPoolExecutor(max_workers=EMBED_MAX_WORKERS) as executor:
+            results = self._embed_texts(texts, executor)
+            
+            for error, text, embedding in zip(error_codes, texts, results):
+                if embedding is None:
+                    logger.error(f"Failed to process error code {error['code']}")
+                    continue
                 
-                # Generate embedding
-                logger.info(f"Processing {i+1}/{len(error_codes)}: {error['code']}")
-                embedding = self.generate_embedding(text)
+                # Write straight into a pre-allocated matrix (no list + vstack copy).
+                # Failed rows are skipped, so valid rows stay packed at the front.
+                if embeddings_array is None:
+                    embeddings_array = np.empty((len(texts), embedding.shape[0]), dtype=np.float32)
                 
-                embeddings.append(embedding)
+                # Row position in the FAISS index == metadata id
+                i = n_embedded
+                embeddings_array[i] = embedding
+                n_embedded += 1
                 
                 # CRITICAL: Attach metadata for tree-based filtering
                 # Source is CSV -> category='ERROR_CODES', type='text'
-                metadata.append({
-                    'id': i,
-                    'category': config.CATEGORY_ERROR_CODES,  # Tree category
-                    'type': 'text',  # Content type
-                    'code': error['code'],
-                    'name': error['name'],
-                    'description': error['description'],
-                    'text': text
-                })
+                metadata['category'].append(config.CATEGORY_ERROR_CODES)  # Tree category
+                metadata['type'].append('text')  # Content type
+                metadata['code'].append(error['code'])
+                metadata['name'].append(error['name'])
+                metadata['description'].append(error['description'])
+                metadata['text'].append(text)
                 
                 # Add to category index
                 category_index[config.CATEGORY_ERROR_CODES].append(i)
-                
-            except Exception as e:
-                logger.error(f"Failed to process error code {error['code']}: {e}")
-                continue
         
-        if not embeddings:
+        if not n_embedded:
             raise ValueError("No embeddings were generated successfully")
         
-        # Convert to numpy array
-        embeddings_array = np.vstack(embeddings)
-        logger.info(f"Generated {len(embeddings)} embeddings with shape {embeddings_array.shape}")
+        # Trim unused rows (a contiguous view, no copy) and L2-normalize in
+        # place so inner product == cosine
+        embeddings_array = embeddings_array[:n_embedded]
+        faiss.normalize_L2(embeddings_array)
+        logger.info(f"Generated {n_embedded} embeddings with shape {embeddings_array.shape}")
         
         # Create FAISS index
         # TODO: Replace with Amazon Aurora pgvector connection
@@ -215,26 +369,47 @@ class RAGIngestor:
         #     );
         # """)
         
-        dimension = embeddings_array.shape[1]
-        index = faiss.IndexFlatL2(dimension)  # L2 distance for similarity
-        index.add(embeddings_array)
+        index = self._build_index(embeddings_array)
         
         # Save FAISS index
         faiss.write_index(index, str(self.index_file))
         logger.info(f"Saved FAISS index to {self.index_file}")
         
-        # Save metadata
-        with open(self.metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        # Save the exact float32 vectors; the retriever memory-maps them
+        np.save(self.vectors_file, embeddings_array)
+        logger.info(f"Saved vectors to {self.vectors_file}")
+        
+        # Save metadata as a columnar Parquet table. The low-cardinality
+        # category/type columns are dictionary-encoded (a few strings shared
+        # by every row), and the retriever reads it back without building
+        # one dict per row.
+        meta_table = pa.table({
+            'category': pa.array(metadata['category'], pa.string()).dictionary_encode(),
+            'type': pa.array(metadata['type'], pa.string()).dictionary_encode(),
+            'code': pa.array(metadata['code'], pa.string()),
+            'name': pa.array(metadata['name'], pa.string()),
+            'description': pa.array(metadata['description'], pa.string()),
+            'text': pa.array(metadata['text'], pa.string())
+        })
+        pq.write_table(meta_table, self.metadata_file)
         logger.info(f"Saved metadata to {self.metadata_file}")
         
-        # Save category index (THE TREE STRUCTURE)
-        with open(self.category_index_file, 'w') as f:
-            json.dump(category_index, f, indent=2)
-        logger.info(f"Saved category index to {self.category_index_file}")
+        # Save category index (THE TREE STRUCTURE): one small FAISS index per
+        # category, so a routed query only searches its own branch. The id
+        # array maps each sub-index row back to its global metadata row.
+        for category, ids in category_index.items():
+            ids = np.array(ids, dtype=np.int64)
+            np.save(self.category_index_files[category], ids)
+            if len(ids):
+                sub_index = self._build_index(embeddings_array[ids])
+                faiss.write_index(sub_index, str(self.category_faiss_files[category]))
+            else:
+                # Don't leave a stale branch behind from a previous ingest
+                self.category_faiss_files[category].unlink(missing_ok=True)
+        logger.info(f"Saved category index to {self.vector_store_path}")
         logger.info(f"Category breakdown: {[(k, len(v)) for k, v in category_index.items()]}")
         
-        logger.info(f"✅ Ingestion complete! Indexed {len(embeddings)} error codes.")
+        logger.info(f"✅ Ingestion complete! Indexed {n_embedded} error codes.")
 
 
 def main():
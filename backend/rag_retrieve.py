@@ -2,14 +2,15 @@
 RAG Retrieval Module for Mistri.AI
 Searches the vector database for relevant error codes using semantic similarity.
 """
-import json
 import logging
+import threading
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
-import boto3
 import numpy as np
 import faiss
+import orjson
+import pyarrow.parquet as pq
 
 from backend.config import config
 
@@ -20,6 +21,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# HNSW candidate list size at query time (higher = better recall, slower search)
+HNSW_EF_SEARCH = 64
+
 
 class RAGRetriever:
     """
@@ -34,11 +38,8 @@ class RAGRetriever:
     def __init__(self):
         """Initialize the RAG retriever with Bedrock client and FAISS index."""
         try:
-            # Initialize Bedrock Runtime client
-            self.bedrock_runtime = boto3.client(
-                service_name='bedrock-runtime',
-                **config.get_boto3_session_kwargs()
-            )
+            # Shared Bedrock Runtime client
+            self.bedrock_runtime = config.get_bedrock_client()
             logger.info(f"Initialized Bedrock client in region: {config.aws_region}")
         except Exception as e:
             logger.error(f"Failed to initialize Bedrock client: {e}")
@@ -47,8 +48,23 @@ class RAGRetriever:
         # Load FAISS index and metadata
         self.vector_store_path = Path(config.vector_store_path)
         self.index_file = self.vector_store_path / "faiss_index.bin"
-        self.metadata_file = self.vector_store_path / "metadata.json"
-        self.category_index_file = self.vector_store_path / "category_index.json"
+        self.vectors_file = self.vector_store_path / "vectors.npy"
+        self.metadata_file = self.vector_store_path / "metadata.parquet"
+        
+        # Per-category sub-index (THE TREE BRANCHES) + its sub-row -> global id map
+        categories = (
+            config.CATEGORY_ERROR_CODES,
+            config.CATEGORY_SCHEMATICS,
+            config.CATEGORY_GENERAL
+        )
+        self.category_index_files = {
+            category: self.vector_store_path / f"category_{category.lower()}.npy"
+            for category in categories
+        }
+        self.category_faiss_files = {
+            category: self.vector_store_path / f"faiss_{category.lower()}.bin"
+            for category in categories
+        }
         
         self._load_index()
     
@@ -85,44 +101,85 @@ class RAGRetriever:
             # """, (query_embedding, intent_category, top_k))
             
             self.index = faiss.read_index(str(self.index_file))
+            if hasattr(self.index, 'hnsw'):
+                self.index.hnsw.efSearch = HNSW_EF_SEARCH
             logger.info(f"Loaded FAISS index with {self.index.ntotal} vectors")
             
+            # Memory-map the exact float32 vectors: zero-copy, and the pages are
+            # shared by every worker process via the OS page cache
+            if self.vectors_file.exists():
+                self.vectors = np.load(self.vectors_file, mmap_mode='r')
+            else:
+                logger.warning("Vectors file not found. Scores will come from the fp16 index.")
+                self.vectors = None
+            
             # Load metadata
-            with open(self.metadata_file, 'r') as f:
-                self.metadata = json.load(f)
-            logger.info(f"Loaded metadata for {len(self.metadata)} error codes")
+            # Columnar table: row i describes FAISS row i
+            self.metadata = pq.read_table(self.metadata_file)
+            logger.info(f"Loaded metadata for {self.metadata.num_rows} error codes")
             
             # Load category index (THE TREE STRUCTURE)
-            if self.category_index_file.exists():
-                with open(self.category_index_file, 'r') as f:
-                    self.category_index = json.load(f)
+            self.category_index = {
+                category: np.load(path)
+                for category, path in self.category_index_files.items()
+                if path.exists()
+            }
+            if self.category_index:
                 logger.info(f"Loaded category index: {[(k, len(v)) for k, v in self.category_index.items()]}")
             else:
                 logger.warning("Category index not found. Filtered search will not be available.")
-                self.category_index = {}
+            
+            # Per-category sub-indices are read lazily on first routed query
+            self.category_indices: Dict[str, faiss.Index] = {}
             
         except Exception as e:
             logger.error(f"Failed to load index: {e}")
             raise
     
+    def _get_category_index(self, category: str) -> faiss.Index:
+        """
+        Return the FAISS sub-index for a category, loading it on first use.
+        
+        Args:
+            category: Category name ('ERROR_CODES', 'SCHEMATICS', 'GENERAL')
+            
+        Returns:
+            FAISS index over only that category's vectors
+        """
+        index = self.category_indices.get(category)
+        if index is None:
+            index = faiss.read_index(str(self.category_faiss_files[category]))
+            if hasattr(index, 'hnsw'):
+                index.hnsw.efSearch = HNSW_EF_SEARCH
+            self.category_indices[category] = index
+            logger.info(f"Loaded {category} sub-index with {index.ntotal} vectors")
+        return index
+    
     def generate_embedding(self, text: str) -> np.ndarray:
         """
-        Generate embedding for query text using Amazon Bedrock Titan.
+        Generate embedding for query text using the configured Bedrock
+        embed model (Titan, or Cohere sent as a one-text batch).
         
         Args:
             text: Query text to embed
             
         Returns:
-            numpy array of embedding vector (1536 dimensions)
+            numpy array of embedding vector (1024 dimensions for Titan v2)
             
         Raises:
             Exception: If Bedrock API call fails
         """
         try:
-            # Prepare request body
-            request_body = json.dumps({
-                "inputText": text
-            })
+            # Prepare request body (batch-capable models take a list of texts)
+            if config.embed_model_accepts_batches():
+                request_body = orjson.dumps({
+                    "texts": [text],
+                    "input_type": "search_query"
+                })
+            else:
+                request_body = orjson.dumps({
+                    "inputText": text
+                })
             
             # Invoke Bedrock model
             response = self.bedrock_runtime.invoke_model(
@@ -133,8 +190,11 @@ class RAGRetriever:
             )
             
             # Parse response
-            response_body = json.loads(response['body'].read())
-            embedding = np.array(response_body['embedding'], dtype=np.float32)
+            response_body = orjson.loads(response['body'].read())
+            if config.embed_model_accepts_batches():
+                embedding = np.array(response_body['embeddings'][0], dtype=np.float32)
+            else:
+                embedding = np.array(response_body['embedding'], dtype=np.float32)
             
             return embedding
             
@@ -180,55 +240,50 @@ class RAGRetriever:
             
             query_embedding = self.generate_embedding(query_text)
             
-            # Reshape for FAISS (expects 2D array)
+            # Reshape for FAISS (expects 2D array) and normalize to match the index
             query_vector = query_embedding.reshape(1, -1)
+            faiss.normalize_L2(query_vector)
             
             # THE TREE LOGIC: Filter by category if specified
             if intent_category and intent_category in self.category_index:
                 # Get valid IDs for this category
                 valid_ids = self.category_index[intent_category]
                 
-                if not valid_ids:
+                if len(valid_ids) == 0:
                     logger.warning(f"No embeddings found for category: {intent_category}")
                     return []
                 
                 logger.info(f"Searching {len(valid_ids)} embeddings in category {intent_category}")
                 
-                # Create ID selector for filtered search
-                id_selector = faiss.IDSelectorBatch(np.array(valid_ids, dtype=np.int64))
-                
-                # Create search parameters with ID filter
-                params = faiss.SearchParametersIVF()
-                params.sel = id_selector
-                
-                # Perform filtered search
-                # Note: For IndexFlatL2, we need to manually filter results
-                # since it doesn't support search parameters
-                distances, indices = self.index.search(query_vector, min(top_k * 3, self.index.ntotal))
-                
-                # Filter results to only include valid category IDs
-                filtered_results = []
-                for dist, idx in zip(distances[0], indices[0]):
-                    if idx in valid_ids:
-                        filtered_results.append((dist, idx))
-                        if len(filtered_results) >= top_k:
-                            break
-                
-                distances = np.array([[r[0] for r in filtered_results]])
-                indices = np.array([[r[1] for r in filtered_results]])
+                # Search only this category's sub-index, then map its rows
+                # back to global metadata ids
+                sub_index = self._get_category_index(intent_category)
+                distances, sub_rows = sub_index.search(query_vector, top_k)
+                indices = np.where(sub_rows >= 0, valid_ids[sub_rows], -1)
             else:
                 # Search all embeddings (no filter)
                 logger.info(f"Searching all {self.index.ntotal} embeddings")
                 distances, indices = self.index.search(query_vector, top_k)
             
-            # Prepare results
+            # FAISS pads with -1 when fewer than top_k hits are found
+            found = (indices[0] >= 0) & (indices[0] < self.metadata.num_rows)
+            hits, scores = indices[0][found], distances[0][found]
+            
+            # Rescore the ANN candidates exactly (the index stores fp16) by
+            # reading just those rows from the memory-mapped vectors
+            if self.vectors is not None and len(hits):
+                scores = self.vectors[hits] @ query_vector[0]
+                order = np.argsort(-scores, kind='stable')
+                hits, scores = hits[order], scores[order]
+            
+            # Prepare results: materialize only the hit rows of the metadata table
             results = []
-            for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx < len(self.metadata):
-                    result = self.metadata[idx].copy()
-                    result['similarity_score'] = float(1 / (1 + distance))  # Convert distance to similarity
-                    result['rank'] = i + 1
-                    results.append(result)
+            rows = self.metadata.take(hits).to_pylist()
+            for i, (score, idx, row) in enumerate(zip(scores, hits, rows)):
+                result = {'id': int(idx), **row}
+                result['similarity_score'] = float(score)  # Cosine similarity (higher = closer)
+                result['rank'] = i + 1
+                results.append(result)
             
             logger.info(f"Found {len(results)} matches")
             return results
@@ -238,8 +293,10 @@ class RAGRetriever:
             raise
 
 
-# Global retriever instance (lazy loaded)
+# Global retriever instance (lazy loaded). search_manual runs in worker
+# threads, so first-time construction is guarded by a lock.
 _retriever: Optional[RAGRetriever] = None
+_retriever_lock = threading.Lock()
 
 
 def get_retriever() -> RAGRetriever:
@@ -251,7 +308,9 @@ def get_retriever() -> RAGRetriever:
     """
     global _retriever
     if _retriever is None:
-        _retriever = RAGRetriever()
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = RAGRetriever()
     return _retriever
 
 
@@ -48,7 +48,7 @@ def test_vector_store():
     """Test if vector store has been created."""
     print("\n🔍 Testing vector store...")
     index_path = Path("data/vector_store/faiss_index.bin")
-    metadata_path = Path("data/vector_store/metadata.json")
+    metadata_path = Path("data/vector_store/metadata.parquet")
     
     if index_path.exists() and metadata_path.exists():
         print(f"✅ Vector store exists")